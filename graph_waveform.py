@@ -5,26 +5,45 @@
 
 from pysdg2000x import *
 import matplotlib.pyplot as plt
+import numpy as np
 import argparse
+import os
 import sys
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument ('-n', '--name')
     parser.add_argument ('-l', '--list', action='store_true')
+    parser.add_argument ('-c', '--cache', help='npz archive keyed by waveform name, loaded if it matches --name, otherwise fetched and saved')
     args = parser.parse_args ()
 
     if not args.name and not args.list:
         parser.print_help ()
         sys.exit (-1)
-        
-    with SDG2000X ('192.168.1.150') as sig:
-        if args.name:
-            resp = sig.getWaveform (args.name)
-            waveform = resp['WAVEDATA']
 
-            # Create plot
-            plt.plot (waveform)
-            plt.show ()
-        elif args.list:
+    if args.name:
+        # Load from cache if it holds this waveform, otherwise fetch from siggen
+        waveform = None
+        if args.cache and os.path.exists (args.cache):
+            # Treat unreadable or foreign files as a cache miss
+            try:
+                with np.load (args.cache) as cache:
+                    if str (cache['name']) == args.name:
+                        waveform = cache['waveform']
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                waveform = None
+        if waveform is None:
+            with SDG2000X ('192.168.1.150') as sig:
+                resp = sig.getWaveform (args.name)
+                waveform = resp['WAVEDATA']
+            if args.cache:
+                # Save through file object so numpy doesn't append an extension
+                with open (args.cache, 'wb') as f:
+                    np.savez (f, name=args.name, waveform=np.asarray (waveform))
+
+        # Create plot
+        plt.plot (waveform)
+        plt.show ()
+    elif args.list:
+        with SDG2000X ('192.168.1.150') as sig:
             print (sig.getWaveformList ())
@@ -4,13 +4,23 @@
 #
 #
 import sys
+import array
 import socket
 import time
 import re
 import string
 import struct
-from itertools import pairwise
-from contextlib import suppress
+import logging
+from functools import cached_property
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger (__name__)
+
+__all__ = ['SDG2000X', 'SDG2000XNetworkException', 'SDG2000XParameterException']
 
 class SDG2000XNetworkException(Exception):
     pass
@@ -22,12 +32,17 @@ class SDG2000XParameterException(Exception):
 class SDG2000X:
 
     PORT = 5025
+    SOCKBUF = 1 << 20
 
     def __init__(self, ip, port=PORT):
         self.ip = ip
         self.rSocket = None
         try:
             self.rSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Don't delay short commands, buffer large waveform transfers
+            self.rSocket.setsockopt (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.rSocket.setsockopt (socket.SOL_SOCKET, socket.SO_RCVBUF, self.SOCKBUF)
+            self.rSocket.setsockopt (socket.SOL_SOCKET, socket.SO_SNDBUF, self.SOCKBUF)
         except socket.error:
             raise SDG2000XNetworkException ('Failed to create socket')
         try:
@@ -36,10 +51,29 @@ class SDG2000X:
         except socket.error:
             raise SDG2000XNetworkException (f'Failed to connect to: {self.ip}')
 
-        # Get builtin and user waveforms
-        self.builtins = self.getBuiltinWaveforms ()
-        self.user = self.getUserWaveforms ()
-        
+    # Waveform catalog is fetched on first use
+    @cached_property
+    def _catalog(self) -> tuple:
+        # Get builtin and user waveforms in a single round trip
+        resp = self._sendRecv ('STL?;STL? USER', decode='ascii')
+        try:
+            builtin, user = resp.split (';', 1)
+        except ValueError:
+            raise SDG2000XNetworkException ('Invalid waveform list response')
+        return self.getBuiltinWaveforms (builtin), self.getUserWaveforms (user.strip())
+
+    @cached_property
+    def builtins(self) -> dict:
+        return self._catalog[0]
+
+    @cached_property
+    def user(self) -> list:
+        return self._catalog[1]
+
+    @cached_property
+    def user_set(self) -> set:
+        return set (self.user)
+
     def __enter__(self):
         return self
 
@@ -51,17 +85,19 @@ class SDG2000X:
             self.rSocket.close ()
             self.rSocket = None
 
-    def _send(self, cmd, binary=None):
+    def _send(self, cmd, binary=None, settle=0.0):
         if self.rSocket is None:
             raise SDG2000XNetworkException ('Network connection is closed')
         try:
             cmd = cmd.encode('ascii')
-            print (cmd)
-            self.rSocket.sendall (cmd)
+            logger.debug ('%s', cmd)
+            # Send command, payload and terminator in a single write
             if binary:
-                self.rSocket.sendall (binary)
-            self.rSocket.sendall (b'\n')
-            time.sleep (0.2)
+                self.rSocket.sendall (b''.join ((cmd, binary, b'\n')))
+            else:
+                self.rSocket.sendall (cmd + b'\n')
+            if settle:
+                time.sleep (settle)
         except:
             raise SDG2000XNetworkException ('Failed to send data')
 
@@ -70,16 +106,47 @@ class SDG2000X:
             return self.rSocket.recv (cnt)
         except:
             raise SDG2000XNetworkException ('Failed to get response')
+
+    def _recv_exact(self, cnt, head=b''):
+        '''
+        Receive until cnt bytes are buffered, including already received head
+        '''
+        buf = bytearray (cnt)
+        mv = memoryview (buf)
+        off = len (head)
+        mv[:off] = head
+        while off < cnt:
+            try:
+                n = self.rSocket.recv_into (mv[off:])
+            except:
+                raise SDG2000XNetworkException ('Failed to get response')
+            if not n:
+                raise SDG2000XNetworkException ('Connection closed during transfer')
+            off += n
+        return buf
         
-    def _sendRecv(self, cmd, decode=None) -> dict:
+    def _sendRecv(self, cmd, decode=None, until=None) -> dict:
+        '''
+        Text responses are read up to the newline terminator, binary
+        responses until the until marker, callers read the rest themselves
+        '''
         try:
             self._send (cmd)
-            resp = self.rSocket.recv (8192)
+            resp = bytearray ()
+            while True:
+                chunk = self.rSocket.recv (8192)
+                if not chunk:
+                    break
+                resp += chunk
+                if until in resp if until else resp.endswith (b'\n'):
+                    break
+            resp = bytes (resp)
         except:
             raise SDG2000XNetworkException ('Failed to get response')
+        # Binary payloads may end in whitespace bytes, don't strip them
         if decode:
-            resp = resp.decode (decode)
-        return resp.strip()
+            return resp.decode (decode).strip()
+        return resp
     
     def toDict(self, keys, vals) -> dict:
         if not isinstance (vals, list):
@@ -96,26 +163,29 @@ class SDG2000X:
         resp = self._sendRecv ('*IDN?', decode='ascii')
         return self.toDict (['manufacturer','model','serial','version'], resp)
 
-    def getBuiltinWaveforms(self) -> dict:
+    def getBuiltinWaveforms(self, resp=None) -> dict:
         '''
         STL?
         STL Mxx, Name1, Myy, Name2
+        resp may be passed in if already fetched
+        Returns name -> (raw Mxx, numeric index)
         '''
+        if resp is None:
+            resp = self._sendRecv ('STL?', decode='ascii')
+        resp = resp[4:].split (',')
         d = {}
-        resp = self._sendRecv ('STL?', decode='ascii')[4:].split (',')
-        it = pairwise (resp)
-        for idx, name in it:
-            d[name.strip()] = idx.strip()
-            with suppress (Exception):
-                next (it)
+        for idx, name in zip (resp[0::2], resp[1::2]):
+            idx = idx.strip()
+            d[name.strip()] = (idx, idx[1:])
         return d
 
-    def getUserWaveforms(self) -> list:
-        resp = self._sendRecv ('STL? USER', decode='ascii')[9:].split (',')
-        return resp
+    def getUserWaveforms(self, resp=None) -> list:
+        if resp is None:
+            resp = self._sendRecv ('STL? USER', decode='ascii')
+        return resp[9:].split (',')
 
     def getWaveformList(self) -> list:
-        return list(self.builtins.keys()) + self.user
+        return list(self.builtins) + self.user
     
     def getWaveform(self, name) -> dict:
         '''
@@ -124,59 +194,85 @@ class SDG2000X:
         '''
         # Check if builtin
         if name in self.builtins:
-            _name = self.builtins[name]
+            _name = self.builtins[name][0]
         # Must be user waveform
-        elif name in self.user:
+        elif name in self.user_set:
             _name = f'USER,{name}'
+        else:
+            raise SDG2000XParameterException (f'Waveform not found: {name}')
 
         # Get header and parse
         try:
-            resp = self._sendRecv (f'WVDT? {_name}')
+            resp = self._sendRecv (f'WVDT? {_name}', until=b'WAVEDATA,')
         except SDG2000XNetworkException:
             raise SDG2000XParameterException (f'Waveform not found: {name}')
-        
-        end = resp.find(b'WAVEDATA')+9
+
+        end = resp.find(b'WAVEDATA,')
+        if end < 0:
+            raise SDG2000XNetworkException ('Invalid waveform header')
+        end += 9
         binary = resp[end:]
-        header = resp[5:end].decode ('ascii').split (',')
-        keys = [x.strip() for x in header[::2]]
-        vals = [x.strip() for x in header[1::2]]
-        
-        # Create dict
-        d = self.toDict (keys, vals)
-        d['LENGTH'] = int(d['LENGTH'][:-1])
+        header = iter (resp[5:end].decode ('ascii').split (','))
+
+        # Create dict from key, value pairs
+        d = {k.strip(): v.strip() for k, v in zip (header, header)}
+        d['LENGTH'] = int(d['LENGTH'].rstrip ('B'))
         d['TYPE'] = int(d['TYPE'])
 
-        # Get rest of data
-        if len(binary) < d['LENGTH']:
-            binary += self._recv (d['LENGTH'] - len(binary))
-        cnt = int (len (binary) / 2)
-        d['WAVEDATA'] = list(struct.unpack (f'<{cnt}h', binary))
+        # Get rest of data along with the trailing terminator
+        if len(binary) < d['LENGTH'] + 1:
+            binary = self._recv_exact (d['LENGTH'] + 1, binary)
+        binary = memoryview (binary)[:d['LENGTH']]
+        if np is not None:
+            d['WAVEDATA'] = np.frombuffer (binary, dtype='<i2')
+        else:
+            a = array.array ('h')
+            a.frombytes (binary)
+            if sys.byteorder == 'big':
+                a.byteswap ()
+            d['WAVEDATA'] = a
         return d
 
-    def saveWaveform(self, name, data, ch=1) -> None:
+    def saveWaveform(self, name, data, ch=1, settle=0.0) -> None:
         '''
         Stores int16 data as waveform name
+        data may be a list, array('h') or any int16 array (ndarray) when numpy is available
+        settle is the time in seconds to wait after upload
         '''
-        if not isinstance (data, list):
-            raise SDG2000XParameterException ('Invalid data format')
         # Convert to binary
-        print (data)
-        binary = struct.pack (f'<{len(data)}h', *data)
-        print (binary)
+        if isinstance (data, list):
+            binary = struct.pack (f'<{len(data)}h', *data)
+        elif isinstance (data, array.array) and data.typecode == 'h':
+            if sys.byteorder == 'big':
+                data = array.array ('h', data)
+                data.byteswap ()
+            binary = data.tobytes ()
+        elif np is not None:
+            arr = np.asarray (data)
+            if arr.dtype.kind not in 'iu':
+                raise SDG2000XParameterException ('Invalid data format')
+            # Never send wrapped samples to the siggen
+            if arr.size and (arr.min () < -32768 or arr.max () > 32767):
+                raise SDG2000XParameterException ('Data out of int16 range')
+            binary = arr.astype ('<i2').tobytes ()
+        else:
+            raise SDG2000XParameterException ('Invalid data format')
         # Send to siggen
         # Why do we need channel here?
-        self._send (f'C{ch}:WVDT WVNM,{name},WAVEDATA,',binary=binary)
-        # Append to user waveforms
-        self.user.append (name)
+        self._send (f'C{ch}:WVDT WVNM,{name},WAVEDATA,',binary=binary, settle=settle)
+        # Append to user waveforms if already fetched
+        if 'user' in self.__dict__ and name not in self.user_set:
+            self.user.append (name)
+            self.user_set.add (name)
         
-    def setArbWaveform(self, name, ch=1):
-        if name in self.builtins.keys():
-            _cmd = f'INDEX,{self.builtins[name][1:]}'
-        elif name in self.user:
+    def setArbWaveform(self, name, ch=1, settle=0.0):
+        if name in self.builtins:
+            _cmd = f'INDEX,{self.builtins[name][1]}'
+        elif name in self.user_set:
             _cmd = f'NAME,{name}'
         else:
             raise SDG2000XParameterException (f'Waveform {name} not found')
-        self._send (f'C{ch}:ARWV {_cmd}')
+        self._send (f'C{ch}:ARWV {_cmd}', settle=settle)
     
     def outputEnable(self, ch=1, load='50'):
         if load != '50' and load != 'HZ':
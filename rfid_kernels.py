@@ -0,0 +1,33 @@
+#!/bin/env python3
+#
+# Numba kernels for RFID waveform generation
+#
+# Tiny Labs Inc
+# 2023
+#
+import numpy as np
+from numba import njit, prange
+
+@njit (parallel=True, fastmath=True, cache=True)
+def render (gain, phase, sine_table):
+    '''
+    Render one sine period per bit, scaled by gain[n] and started at
+    sample phase[n]. Returns float32 amplitude and int16 samples
+    '''
+    pts = sine_table.shape[0]
+    amp = np.empty (gain.shape[0] * pts, dtype=np.float32)
+    quant = np.empty (gain.shape[0] * pts, dtype=np.int16)
+    for n in prange (gain.shape[0]):
+        g = gain[n]
+        p = phase[n]
+        base = n * pts
+        # Split at the table wrap so both loops stay contiguous
+        for i in range (pts - p):
+            v = sine_table[p + i] * g
+            amp[base + i] = v
+            quant[base + i] = min (max (round (v), -32768), 32767)
+        for i in range (pts - p, pts):
+            v = sine_table[p + i - pts] * g
+            amp[base + i] = v
+            quant[base + i] = min (max (round (v), -32768), 32767)
+    return amp, quant
@@ -10,6 +10,22 @@ import numpy as np
 import matplotlib.pyplot as plt
 import struct
 import time
+import functools
+
+# Optional numba kernel, fall back to numpy if unavailable
+try:
+    from rfid_kernels import render
+except ImportError:
+    render = None
+
+@functools.lru_cache (maxsize=16)
+def _sine_table (pts):
+    ''' One sine period of pts samples '''
+    table = np.sin (np.linspace (0, 2*np.pi, pts, endpoint=False, dtype=np.float32))
+    # Shared between callers, don't allow modification
+    table.flags.writeable = False
+    return table
+
 class RFIDWaveform:
 
     def __init__(self, name, pts, data=None):
@@ -19,31 +35,34 @@ class RFIDWaveform:
         self.ts = 2*np.pi / pts
         self.data = data
         self.amp = None
+        self.quant = None
 
-    # TODO: Add PSK phase shift support
     def generate (self, modulation=0.5, scale=2**15, psk=False):
         ''' Generate RF data '''
         modulation = 1 - modulation
         if self.data:
-            self.time = np.arange(0, self.ts * self.pts * len (self.data), self.ts)
-            amp = []
-            time = np.arange (0, 2*np.pi, self.ts)
+            sine = _sine_table (self.pts)
+            bits = np.asarray (self.data, dtype=np.uint8)
+
+            # Per-bit gain: modulated bits are scaled down
+            gain = np.where (bits, modulation, 1.0).astype (np.float32) * np.float32 (scale)
+
+            # Running PSK phase, carrier shifts 180 degrees on each set bit
+            if psk:
+                phase = ((np.cumsum (bits) & 1) * (self.pts // 2)).astype (np.intp)
+            else:
+                phase = np.zeros (bits.size, dtype=np.intp)
 
-            # Loop through data
-            for n, bit in enumerate (self.data):
-                # Set modulation
-                mod = modulation if bit else 1
-                
-                # Generate amplitude
-                amp += [x * mod * scale for x in np.sin(time)]
-            self.amp = amp
-            if len (self.time) != len (self.amp):
-                self.time = self.time[:-1]
+            if render is not None:
+                self.amp, self.quant = render (gain, phase, sine)
+            else:
+                idx = (np.arange (self.pts) + phase[:, None]) % self.pts
+                self.amp = (sine[idx] * gain[:, None]).ravel ()
+                self.quant = np.clip (np.rint (self.amp), -32768, 32767).astype (np.int16)
+            self.time = np.arange (self.amp.size) * self.ts
 
     def int16 (self):
-        quant = [int (x) for x in self.amp]
-        quant = [32767 if x == 32768 else x for x in quant]
-        return quant
+        return self.quant
 
     def plot (self):
         plt.plot (self.time, self.amp)